@@ -1,14 +1,28 @@
 import asyncio
+import contextlib
 import logging
 import time
+from collections.abc import Awaitable, Iterator
 from datetime import datetime
 from types import TracebackType
+from typing import TypeVar
 
 from aiohttp import ClientHandlerType, ClientRequest, ClientResponse, ClientSession
 
-from myconso.middlewares import exponential_backoff_middleware
+from myconso.middlewares import (
+    AIMD_INITIAL_LIMIT,
+    AIMD_MAX_LIMIT,
+    PRIORITY_BULK,
+    AdaptiveConcurrencyLimiter,
+    JournalRecorder,
+    exponential_backoff_middleware,
+    request_priority,
+    request_unlimited,
+)
+from myconso.profiling import Profiler
 from myconso.utils import (
     clean_json_ld,
+    counters_from_dashboard,
     decode_jwt,
     first_day_of_the_month,
     last_day_of_the_month,
@@ -19,17 +33,12 @@ log = logging.getLogger(__name__)
 MYCONSO_API = "https://api.myconso.net"
 MYCONSO_USER_AGENT = "MyConso"
 
+T = TypeVar("T")
+
 
 def check_auth(func):
     async def wrapper(self, *args, **kwargs):
-        if not self.token and (self.username and self.password):
-            # class has been initialized with username/password
-            async with self.lock:
-                await self.auth()
-        elif not self._housing and self.token and self.refresh_token:
-            # class has been initialized with token/refresh_token
-            async with self.lock:
-                await self.auth_refresh()
+        await self._ensure_auth()
         return await func(self, *args, **kwargs)
 
     return wrapper
@@ -42,12 +51,17 @@ class MyConsoClient:
     refresh_token: str | None
     _counters: list[dict]
 
-    def __init__(
+    def __init__(  # noqa: PLR0913
         self,
         username: str | None = None,
         password: str | None = None,
         token: str | None = None,
         refresh_token: str | None = None,
+        *,
+        base_url: str = MYCONSO_API,
+        journal: str | None = None,
+        profile: bool = False,
+        concurrency: int = AIMD_INITIAL_LIMIT,
     ) -> None:
         if token and refresh_token:
             self.token = token
@@ -65,14 +79,25 @@ class MyConsoClient:
 
         self._housing = None
         self._counters = []
-        self.lock = asyncio.Lock()
+        self.profiler = Profiler() if profile else None
+        self.lock = self.profiler.lock() if self.profiler else asyncio.Lock()
+        self.limiter = AdaptiveConcurrencyLimiter(
+            initial_limit=concurrency, max_limit=max(AIMD_MAX_LIMIT, concurrency)
+        )
+        self.journal = JournalRecorder(journal) if journal else None
         self.session = ClientSession(
-            base_url=MYCONSO_API,
+            base_url=base_url,
             headers={"user-agent": MYCONSO_USER_AGENT},
             raise_for_status=True,
+            trace_configs=[self.profiler.trace_config()] if self.profiler else None,
             middlewares=(
+                *((self.profiler.request_middleware,) if self.profiler else ()),
                 exponential_backoff_middleware,
+                *((self.profiler.attempt_middleware,) if self.profiler else ()),
                 self._auth_refresh_middleware,
+                # inside the auth refresh, so it only measures network exchanges
+                self.limiter,
+                *((self.journal,) if self.journal else ()),
             ),
         )
 
@@ -89,6 +114,43 @@ class MyConsoClient:
 
     async def close(self) -> None:
         await self.session.close()
+        if self.journal:
+            self.journal.close()
+        if self.profiler:
+            await self.profiler.stop()
+            log.info("profile:\n%s", self.profiler.format_report())
+
+    @contextlib.contextmanager
+    def bulk(self) -> Iterator[None]:
+        # requests sent from this context, and the tasks it creates, are
+        # scheduled after interactive ones and leave them reserved slots
+        token = request_priority.set(PRIORITY_BULK)
+        try:
+            yield
+        finally:
+            request_priority.reset(token)
+
+    async def _json(self, res: ClientResponse) -> dict:
+        if not self.profiler:
+            return clean_json_ld(await res.json())
+        with self.profiler.timed("body_read"):
+            await res.read()
+        with self.profiler.timed("parse"):
+            return clean_json_ld(await res.json())
+
+    async def _ensure_auth(self) -> None:
+        # the condition is checked again once the lock is acquired, concurrent
+        # calls waiting on the lock reuse the first authentication
+        if not self.token and (self.username and self.password):
+            # class has been initialized with username/password
+            async with self.lock:
+                if not self.token:
+                    await self.auth()
+        elif not self._housing and self.token and self.refresh_token:
+            # class has been initialized with token/refresh_token
+            async with self.lock:
+                if not self._housing:
+                    await self.auth_refresh()
 
     async def _auth_refresh_middleware(
         self, req: ClientRequest, handler: ClientHandlerType
@@ -101,7 +163,8 @@ class MyConsoClient:
                 epoch_now,
             )
             async with self.lock:
-                await self.auth_refresh()
+                if time.time() > self.token_exp:
+                    await self.auth_refresh()
 
         for _ in range(2):
             res = await handler(req)
@@ -156,34 +219,24 @@ class MyConsoClient:
     @check_auth
     async def get_user(self) -> dict:
         async with self.session.get(f"/secured/users/{self._user}") as res:
-            return clean_json_ld(await res.json())
+            return await self._json(res)
 
     @check_auth
     async def get_housing(self) -> dict:
         async with self.session.get(f"/secured/housing/{self._housing}") as res:
-            return clean_json_ld(await res.json())
+            return await self._json(res)
 
     @check_auth
     async def get_dashboard(self) -> dict:
         async with self.session.get(
             f"/secured/consumption/{self._housing}/dashboard"
         ) as res:
-            return clean_json_ld(await res.json())
+            return await self._json(res)
 
     @check_auth
     async def get_counters(self) -> list[dict]:
         if not self._counters:
-            res = await self.get_dashboard()
-            for v in res["currentMonth"]["values"]:
-                for counter in v["counters"]:
-                    self._counters.append(
-                        {
-                            "counter": counter,
-                            "fluidType": v["fluidType"],
-                            "meterType": v["meterType"],
-                            "unit": v["unit"],
-                        }
-                    )
+            self._counters = counters_from_dashboard(await self.get_dashboard())
         return self._counters
 
     @check_auth
@@ -205,7 +258,7 @@ class MyConsoClient:
                 "endDate": enddate.isoformat(timespec="milliseconds"),
             },
         ) as res:
-            return clean_json_ld(await res.json())
+            return await self._json(res)
 
     @check_auth
     async def get_meter_info(self, counter: str) -> dict | None:
@@ -217,7 +270,7 @@ class MyConsoClient:
                 async with self.session.get(
                     f"/secured/meter/{self._housing}/{c['meterType']}/{c['counter']}/info",
                 ) as res:
-                    return clean_json_ld(await res.json())
+                    return await self._json(res)
         return None
 
     @check_auth
@@ -244,5 +297,55 @@ class MyConsoClient:
                         "endDate": enddate.isoformat(timespec="milliseconds"),
                     },
                 ) as res:
-                    return clean_json_ld(await res.json())
+                    return await self._json(res)
         return None
+
+    async def snapshot(self) -> dict:
+        # full refresh of the housing, user and housing are fetched while the
+        # counters are discovered from the dashboard, then every meter info is
+        # fetched at once: auth + 2 round trips instead of 4 + counters
+        timings: dict[str, float] = {}
+
+        async def timed(stage: str, aw: Awaitable[T]) -> T:
+            start = time.perf_counter()
+            try:
+                return await aw
+            finally:
+                timings[stage] = round(time.perf_counter() - start, 6)
+
+        async def meters() -> tuple[dict, list[dict], list[dict | None]]:
+            dashboard = await timed("dashboard", self.get_dashboard())
+            self._counters = counters_from_dashboard(dashboard)
+            # one request per counter, not held by the concurrency limit so
+            # it stays a single round trip with many counters
+            token = request_unlimited.set(True)
+            try:
+                infos = await timed(
+                    "meter_info",
+                    asyncio.gather(
+                        *(self.get_meter_info(c["counter"]) for c in self._counters)
+                    ),
+                )
+            finally:
+                request_unlimited.reset(token)
+            return dashboard, self._counters, infos
+
+        start = time.perf_counter()
+        await timed("auth", self._ensure_auth())
+        user, housing, (dashboard, counters, infos) = await asyncio.gather(
+            timed("user", self.get_user()),
+            timed("housing", self.get_housing()),
+            meters(),
+        )
+        timings["total"] = round(time.perf_counter() - start, 6)
+
+        return {
+            "user": user,
+            "housing": housing,
+            "dashboard": dashboard,
+            "counters": counters,
+            "meters": {
+                c["counter"]: info for c, info in zip(counters, infos, strict=True)
+            },
+            "timings": timings,
+        }
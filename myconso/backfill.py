@@ -0,0 +1,235 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections.abc import Callable, Iterator
+from datetime import datetime, timedelta, timezone
+from typing import IO, Any
+
+from aiohttp.client_exceptions import ClientError, ClientResponseError
+
+from myconso.api import MyConsoClient
+from myconso.utils import as_utc
+
+log = logging.getLogger(__name__)
+
+BACKFILL_WINDOW = timedelta(days=30)
+BACKFILL_CONCURRENCY = 4
+
+
+def plan_units(
+    targets: list[tuple[str, str]],
+    startdate: datetime,
+    enddate: datetime,
+    window: timedelta = BACKFILL_WINDOW,
+) -> list[dict]:
+    # split [startdate, enddate) in windows for each (kind, id) target,
+    # kind is either "meter" (id is a counter) or "consumption" (a fluidtype),
+    # naive dates are utc
+    startdate = as_utc(startdate)
+    enddate = as_utc(enddate)
+    units = []
+    for kind, target in targets:
+        start = startdate
+        while start < enddate:
+            end = min(start + window, enddate)
+            units.append(
+                {
+                    "kind": kind,
+                    "id": target,
+                    "start": start.isoformat(),
+                    # the api end date is inclusive
+                    "end": (end - timedelta(seconds=1)).isoformat(),
+                }
+            )
+            start = end
+    return units
+
+
+def unit_key(unit: dict) -> str:
+    return f"{unit['kind']}/{unit['id']}/{unit['start']}/{unit['end']}"
+
+
+def _read_checkpoint(path: str) -> Iterator[dict]:
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                log.warning("ignore truncated checkpoint line in %s", path)
+
+
+def load_checkpoint(path: str) -> dict[str, dict]:
+    # every completed unit is a json line, a line truncated by a crash is
+    # ignored and its unit planned again
+    return {e["unit"]: e for e in _read_checkpoint(path) if "unit" in e}
+
+
+def load_checkpoint_plan(path: str) -> dict | None:
+    # the first line of a checkpoint records the dates it was planned with
+    return next((e["plan"] for e in _read_checkpoint(path) if "plan" in e), None)
+
+
+class BackfillRunner:
+    def __init__(  # noqa: PLR0913
+        self,
+        client: MyConsoClient,
+        checkpoint: str,
+        startdate: datetime,
+        enddate: datetime | None = None,
+        *,
+        window: timedelta = BACKFILL_WINDOW,
+        concurrency: int = BACKFILL_CONCURRENCY,
+        counters: list[str] | None = None,
+        fluidtypes: list[str] | None = None,
+        progress: Callable[[dict], None] | None = None,
+    ) -> None:
+        self.client = client
+        self.checkpoint = checkpoint
+        self.startdate = as_utc(startdate)
+        self.enddate = as_utc(enddate) if enddate else None
+        self.window = window
+        self.concurrency = concurrency
+        self.counters = counters
+        self.fluidtypes = fluidtypes
+        self.progress = progress
+
+    async def plan(self, enddate: datetime | None = None) -> list[dict]:
+        # all counters and fluidtypes of the housing unless given explicitly
+        counters = self.counters
+        fluidtypes = self.fluidtypes
+        if counters is None or fluidtypes is None:
+            housing_counters = await self.client.get_counters()
+            if counters is None:
+                counters = [c["counter"] for c in housing_counters]
+            if fluidtypes is None:
+                fluidtypes = list(
+                    dict.fromkeys(c["fluidType"] for c in housing_counters)
+                )
+
+        targets = [("meter", c) for c in counters]
+        targets += [("consumption", f) for f in fluidtypes]
+        return plan_units(
+            targets,
+            self.startdate,
+            enddate or self.enddate or datetime.now(timezone.utc),
+            self.window,
+        )
+
+    async def _fetch(self, unit: dict) -> dict | None:
+        startdate = datetime.fromisoformat(unit["start"])
+        enddate = datetime.fromisoformat(unit["end"])
+        if unit["kind"] == "meter":
+            return await self.client.get_meter(unit["id"], startdate, enddate)
+        return await self.client.get_consumption(unit["id"], startdate, enddate)
+
+    def _open_checkpoint(self) -> IO[str]:
+        return open(self.checkpoint, "a", encoding="utf-8")
+
+    async def run(self) -> dict:
+        # without an explicit end date, a resumed run keeps the end date of
+        # the first one, so its last window matches the checkpoint
+        plan = load_checkpoint_plan(self.checkpoint)
+        # windows start from startdate, another one would match no unit
+        if plan and datetime.fromisoformat(plan["startdate"]) != self.startdate:
+            raise ValueError(
+                f"{self.checkpoint} starts on {plan['startdate']}, "
+                f"not {self.startdate.isoformat()}"
+            )
+        if self.enddate:
+            enddate = self.enddate
+        elif plan:
+            enddate = datetime.fromisoformat(plan["enddate"])
+        else:
+            enddate = datetime.now(timezone.utc)
+
+        units = await self.plan(enddate)
+        completed = load_checkpoint(self.checkpoint)
+        pending = [u for u in units if unit_key(u) not in completed]
+        stats: dict[str, Any] = {
+            "total": len(units),
+            "skipped": len(units) - len(pending),
+            "done": 0,
+            "failed": 0,
+            "elapsed": 0.0,
+            "eta": None,
+        }
+        log.info(
+            "backfill %s units, %s already in %s",
+            stats["total"],
+            stats["skipped"],
+            self.checkpoint,
+        )
+
+        queue: asyncio.Queue[dict] = asyncio.Queue()
+        for u in pending:
+            queue.put_nowait(u)
+        start = time.monotonic()
+
+        async def worker() -> None:
+            while not queue.empty():
+                unit = queue.get_nowait()
+                key = unit_key(unit)
+                try:
+                    data = await self._fetch(unit)
+                except (ClientError, asyncio.TimeoutError) as e:
+                    # authentication is lost, every other unit would fail too,
+                    # any other error only fails this unit
+                    if isinstance(e, ClientResponseError) and e.status in {401}:
+                        raise
+                    log.warning("backfill %s failed: %s", key, e)
+                    stats["failed"] += 1
+                else:
+                    f.write(
+                        json.dumps(
+                            {"unit": key, **unit, "data": data},
+                            separators=(",", ":"),
+                        )
+                        + "\n"
+                    )
+                    f.flush()
+                    stats["done"] += 1
+
+                processed = stats["done"] + stats["failed"]
+                stats["elapsed"] = round(time.monotonic() - start, 3)
+                stats["eta"] = round(
+                    stats["elapsed"] / processed * (len(pending) - processed), 3
+                )
+                log.info(
+                    "backfill %s/%s %s, eta: %ss",
+                    stats["skipped"] + processed,
+                    stats["total"],
+                    key,
+                    stats["eta"],
+                )
+                if self.progress:
+                    self.progress(dict(stats))
+
+        # workers inherit the bulk priority, interactive calls made on the
+        # same client while the backfill runs go first
+        with self._open_checkpoint() as f, self.client.bulk():
+            if plan is None:
+                f.write(
+                    json.dumps(
+                        {
+                            "plan": {
+                                "startdate": self.startdate.isoformat(),
+                                "enddate": enddate.isoformat(),
+                            }
+                        }
+                    )
+                    + "\n"
+                )
+                f.flush()
+            workers = [asyncio.ensure_future(worker()) for _ in range(self.concurrency)]
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                for w in workers:
+                    w.cancel()
+
+        stats["elapsed"] = round(time.monotonic() - start, 3)
+        return stats
@@ -5,12 +5,13 @@ import json
 import logging
 
 from myconso.api import MyConsoClient
+from myconso.backfill import BackfillRunner
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
 
 
-async def cli() -> None:
+async def cli() -> None:  # noqa: PLR0912
     parser = argparse.ArgumentParser(description="myconso cli")
     parser.add_argument(
         "--debug",
@@ -19,6 +20,13 @@ async def cli() -> None:
         action="store_true",
         help="enable debug logging",
     )
+    parser.add_argument(
+        "--profile",
+        dest="profile",
+        default=False,
+        action="store_true",
+        help="log a profile of requests, auth lock and event loop lag on exit",
+    )
     parser.add_argument(
         "--email",
         dest="email",
@@ -68,6 +76,13 @@ async def cli() -> None:
         action="store_true",
         help="GET /secured/users/{user}",
     )
+    parser.add_argument(
+        "--snapshot",
+        dest="snapshot",
+        default=False,
+        action="store_true",
+        help="Fetch user, housing, dashboard, counters and meters info concurrently",
+    )
     parser.add_argument(
         "--meter-info",
         dest="meter_info",
@@ -104,13 +119,40 @@ async def cli() -> None:
         help="end date for consumption and meter",
     )
 
+    parser.add_argument(
+        "--backfill",
+        dest="backfill",
+        default=None,
+        type=str,
+        help="Backfill meters and consumptions from --start-date to --end-date, "
+        "completed windows are saved to this checkpoint file and skipped on resume",
+    )
+    parser.add_argument(
+        "--window-days",
+        dest="window_days",
+        default=30,
+        type=int,
+        help="backfill window in days",
+    )
+    parser.add_argument(
+        "--concurrency",
+        dest="concurrency",
+        default=4,
+        type=int,
+        help="backfill windows fetched concurrently",
+    )
+
     args = parser.parse_args()
+    if args.backfill and not args.start_date:
+        parser.error("--backfill requires --start-date")
 
     if args.debug:
         logging.getLogger().setLevel(logging.DEBUG)
         log.debug("debug enabled")
 
-    async with MyConsoClient(username=args.email, password=args.password) as myconso:
+    async with MyConsoClient(
+        username=args.email, password=args.password, profile=args.profile
+    ) as myconso:
         if args.auth:
             print(json.dumps(await myconso.auth(), indent=4))
         elif args.dashboard:
@@ -121,6 +163,18 @@ async def cli() -> None:
             print(json.dumps(await myconso.get_housing(), indent=4))
         elif args.user:
             print(json.dumps(await myconso.get_user(), indent=4))
+        elif args.backfill:
+            runner = BackfillRunner(
+                myconso,
+                args.backfill,
+                args.start_date,
+                args.end_date,
+                window=datetime.timedelta(days=args.window_days),
+                concurrency=args.concurrency,
+            )
+            print(json.dumps(await runner.run(), indent=4))
+        elif args.snapshot:
+            print(json.dumps(await myconso.snapshot(), indent=4))
         elif args.meter_info:
             print(json.dumps(await myconso.get_meter_info(args.meter_info), indent=4))
         elif args.meter:
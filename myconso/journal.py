@@ -0,0 +1,116 @@
+import asyncio
+import gzip
+import io
+import json
+import logging
+import re
+import time
+from collections import deque
+from collections.abc import Iterator
+from typing import IO
+
+import jwt
+from aiohttp import web
+
+log = logging.getLogger(__name__)
+
+JOURNAL_IDENTITY_PATTERNS = {
+    "housing": re.compile(r"^/secured/(?:consumption|housing|meter)/([^/]+)"),
+    "user": re.compile(r"^/secured/users/([^/]+)$"),
+}
+REPLAY_TOKEN_TTL = 3600
+REPLAY_TOKEN_KEY = "myconso-replay-signing-key-0000000"
+
+
+def open_journal(path: str, mode: str) -> IO[str]:
+    # journals ending with .gz are transparently compressed
+    if path.endswith(".gz"):
+        return io.TextIOWrapper(gzip.GzipFile(path, mode), encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def dump_entry(entry: dict) -> str:
+    return json.dumps(entry, separators=(",", ":"), ensure_ascii=False) + "\n"
+
+
+def load_journal(path: str) -> Iterator[dict]:
+    with open_journal(path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def entry_key(method: str, path: str, query: list) -> tuple:
+    return (method.upper(), path, tuple(sorted(tuple(q) for q in query)))
+
+
+def _replay_token() -> str:
+    now = int(time.time())
+    return jwt.encode(
+        {"exp": now + REPLAY_TOKEN_TTL, "iat": now},
+        REPLAY_TOKEN_KEY,
+        algorithm="HS256",
+    )
+
+
+def replay_application(
+    path: str,
+    latency_scale: float = 1.0,
+    housing: str | None = None,
+    user: str | None = None,
+) -> web.Application:
+    # responses for the same request are served back in the recorded order,
+    # the last one is repeated once the recorded ones are exhausted
+    exchanges: dict[tuple, deque[dict]] = {}
+    identity = {"housing": housing, "user": user}
+    for entry in load_journal(path):
+        exchanges.setdefault(
+            entry_key(entry["method"], entry["path"], entry["query"]), deque()
+        ).append(entry)
+        for name, pattern in JOURNAL_IDENTITY_PATTERNS.items():
+            match = pattern.match(entry["path"])
+            if match and not identity[name]:
+                identity[name] = match.group(1)
+
+    log.debug(
+        "loaded %s distinct requests from %s, identity: %s",
+        len(exchanges),
+        path,
+        identity,
+    )
+
+    async def auth(request: web.Request) -> web.Response:
+        # credentials and tokens are never journaled, mint a local token
+        return web.json_response(
+            {
+                "company": "replay",
+                "housing": identity["housing"],
+                "refresh_token": "replay",
+                "token": _replay_token(),
+                "user": {"email": identity["user"]},
+            }
+        )
+
+    async def replay(request: web.Request) -> web.Response:
+        key = entry_key(
+            request.method, request.rel_url.path, list(request.rel_url.query.items())
+        )
+        recorded = exchanges.get(key)
+        if not recorded:
+            if request.method == "POST" and request.path in {"/auth", "/auth/refresh"}:
+                return await auth(request)
+            log.debug("no journal entry for %s %s", request.method, request.path_qs)
+            raise web.HTTPNotFound()
+
+        entry = recorded.popleft() if len(recorded) > 1 else recorded[0]
+        if latency_scale > 0:
+            await asyncio.sleep(entry["elapsed"] * latency_scale)
+        return web.Response(
+            status=entry["status"],
+            text=entry["body"],
+            content_type=entry["content_type"],
+        )
+
+    app = web.Application()
+    app.router.add_route("*", "/{tail:.*}", replay)
+    return app
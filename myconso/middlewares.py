@@ -1,9 +1,15 @@
 import asyncio
+import contextlib
 import logging
 import random
+import time
+from collections import deque
+from contextvars import ContextVar
 
 from aiohttp import ClientHandlerType, ClientRequest, ClientResponse
 
+from myconso.journal import dump_entry, open_journal
+
 log = logging.getLogger(__name__)
 
 BACKOFF_STATUS_CODES = {429, 503}
@@ -12,6 +18,29 @@ BACKOFF_FACTOR = 2.0
 BACKOFF_MAX_DELAY = 60.0
 BACKOFF_JITTER = 2
 
+AIMD_INITIAL_LIMIT = 16
+AIMD_MIN_LIMIT = 2
+AIMD_MAX_LIMIT = 64
+AIMD_INCREASE = 1.0
+AIMD_DECREASE_FACTOR = 0.5
+AIMD_LATENCY_SMOOTHING = 0.1
+AIMD_LATENCY_TOLERANCE = 2.0
+AIMD_LATENCY_MIN_SPIKE = 0.1
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+PRIORITY_RESERVED_SLOTS = 1
+
+# priority of the requests sent from the current context, see MyConsoClient.bulk
+request_priority: ContextVar[int] = ContextVar(
+    "myconso_request_priority", default=PRIORITY_INTERACTIVE
+)
+# requests sent from a context where it's set aren't held by the limiter, for
+# fan-outs of a known size, see MyConsoClient.snapshot
+request_unlimited: ContextVar[bool] = ContextVar(
+    "myconso_request_unlimited", default=False
+)
+
 
 async def exponential_backoff_middleware(
     req: ClientRequest, handler: ClientHandlerType
@@ -33,3 +62,198 @@ async def exponential_backoff_middleware(
         else:
             break
     return res
+
+
+def route_template(req: ClientRequest) -> str:
+    # GET /secured/meter/7552325423/waterHot/ED379533C5 ->
+    # GET /secured/meter/{}/waterHot/{}, ids are the segments with a digit or @
+    path = "/".join(
+        "{}" if any(c.isdigit() or c == "@" for c in segment) else segment
+        for segment in req.url.path.split("/")
+    )
+    return f"{req.method} {path}"
+
+
+class AdaptiveConcurrencyLimiter:
+    # AIMD: the number of requests in flight grows by AIMD_INCREASE every
+    # `limit` healthy responses, and is cut by AIMD_DECREASE_FACTOR on
+    # 429/503 or when the latency goes over AIMD_LATENCY_TOLERANCE times
+    # the moving average of its route (see route_template), so a slow
+    # endpoint isn't compared to a fast one.
+    # Requests are scheduled by request_priority: interactive requests are
+    # woken up before bulk ones, and bulk requests never take the last
+    # `reserved` slots, so an interactive call doesn't wait behind a bulk pull.
+    # min_limit must leave at least one slot to bulk requests, or a bulk pull
+    # alone would stall once the limit is down to the reserved slots
+    def __init__(
+        self,
+        initial_limit: int = AIMD_INITIAL_LIMIT,
+        min_limit: int = AIMD_MIN_LIMIT,
+        max_limit: int = AIMD_MAX_LIMIT,
+        reserved: int = PRIORITY_RESERVED_SLOTS,
+    ) -> None:
+        if min_limit <= reserved:
+            raise ValueError(
+                f"min_limit ({min_limit}) must be greater than reserved ({reserved})"
+            )
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.reserved = reserved
+        self.in_flight = 0
+        self.in_flight_bulk = 0
+        self.latency: dict[str, float] = {}
+        self._limit = float(initial_limit)
+        self._last_decrease = 0.0
+        self._waiters: dict[int, deque[asyncio.Future]] = {
+            PRIORITY_INTERACTIVE: deque(),
+            PRIORITY_BULK: deque(),
+        }
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "in_flight_bulk": self.in_flight_bulk,
+            "waiting": sum(len(w) for w in self._waiters.values()),
+            "waiting_bulk": len(self._waiters[PRIORITY_BULK]),
+            "latency": dict(self.latency),
+        }
+
+    def _can_start(self, priority: int) -> bool:
+        if self.in_flight >= self.limit:
+            return False
+        if priority == PRIORITY_BULK:
+            return not self._waiters[PRIORITY_INTERACTIVE] and (
+                self.in_flight_bulk < self.limit - self.reserved
+            )
+        return True
+
+    def _start(self, priority: int) -> None:
+        self.in_flight += 1
+        if priority == PRIORITY_BULK:
+            self.in_flight_bulk += 1
+
+    async def _acquire(self, priority: int) -> None:
+        if not self._waiters[priority] and self._can_start(priority):
+            self._start(priority)
+            return
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(fut)
+        try:
+            # the slot is handed over by _wakeup, in_flight already counts it
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self._release(priority)
+            else:
+                # _wakeup may already have popped and skipped the cancelled future
+                with contextlib.suppress(ValueError):
+                    self._waiters[priority].remove(fut)
+                self._wakeup()
+            raise
+
+    def _release(self, priority: int) -> None:
+        self.in_flight -= 1
+        if priority == PRIORITY_BULK:
+            self.in_flight_bulk -= 1
+        self._wakeup()
+
+    def _wakeup(self) -> None:
+        for priority, waiters in self._waiters.items():
+            while waiters and self._can_start(priority):
+                fut = waiters.popleft()
+                if not fut.done():
+                    self._start(priority)
+                    fut.set_result(None)
+
+    def _on_response(
+        self, route: str, start: float, status: int, elapsed: float
+    ) -> None:
+        latency = self.latency.get(route)
+        spike = latency is not None and elapsed - latency > max(
+            latency * (AIMD_LATENCY_TOLERANCE - 1), AIMD_LATENCY_MIN_SPIKE
+        )
+        if status in BACKOFF_STATUS_CODES or spike:
+            # only one decrease per congestion event, responses to requests
+            # sent before the previous decrease don't count
+            if start > self._last_decrease:
+                self._limit = max(self.min_limit, self._limit * AIMD_DECREASE_FACTOR)
+                self._last_decrease = time.monotonic()
+                log.debug(
+                    "decrease concurrency limit to %s, status: %s, %s latency: %ss",
+                    self.limit,
+                    status,
+                    route,
+                    round(elapsed, 3),
+                )
+        else:
+            self._limit = min(self.max_limit, self._limit + AIMD_INCREASE / self._limit)
+
+        if status not in BACKOFF_STATUS_CODES:
+            self.latency[route] = (
+                elapsed
+                if latency is None
+                else latency + AIMD_LATENCY_SMOOTHING * (elapsed - latency)
+            )
+
+    async def __call__(
+        self, req: ClientRequest, handler: ClientHandlerType
+    ) -> ClientResponse:
+        priority = request_priority.get()
+        # unlimited requests aren't counted in flight, but their responses
+        # still adjust the limit
+        limited = not request_unlimited.get()
+        if limited:
+            await self._acquire(priority)
+        try:
+            start = time.monotonic()
+            res = await handler(req)
+            self._on_response(
+                route_template(req), start, res.status, time.monotonic() - start
+            )
+        finally:
+            if limited:
+                self._release(priority)
+        return res
+
+
+class JournalRecorder:
+    # record every exchange going through the session to a json lines
+    # journal, that can be served back with myconso.journal.replay_application
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._start = time.monotonic()
+        self._file = open_journal(path, "a")
+
+    async def __call__(
+        self, req: ClientRequest, handler: ClientHandlerType
+    ) -> ClientResponse:
+        start = time.monotonic()
+        res = await handler(req)
+        # read the body now, it's cached on the response for the caller
+        body = await res.read()
+        elapsed = time.monotonic() - start
+
+        self._file.write(
+            dump_entry(
+                {
+                    "t": round(start - self._start, 6),
+                    "method": req.method,
+                    "path": req.url.path,
+                    "query": [[k, v] for k, v in req.url.query.items()],
+                    "status": res.status,
+                    "elapsed": round(elapsed, 6),
+                    "content_type": res.content_type,
+                    "body": body.decode(res.get_encoding(), errors="replace"),
+                }
+            )
+        )
+        return res
+
+    def close(self) -> None:
+        self._file.close()
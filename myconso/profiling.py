@@ -0,0 +1,242 @@
+import asyncio
+import contextlib
+import logging
+import time
+from collections import defaultdict
+from collections.abc import Iterator
+from contextvars import ContextVar
+from types import SimpleNamespace
+from typing import Any, Literal
+
+from aiohttp import (
+    ClientHandlerType,
+    ClientRequest,
+    ClientResponse,
+    ClientSession,
+    TraceConfig,
+    TraceConnectionCreateEndParams,
+    TraceConnectionCreateStartParams,
+    TraceConnectionQueuedEndParams,
+    TraceConnectionQueuedStartParams,
+    TraceRequestEndParams,
+    TraceRequestHeadersSentParams,
+    TraceRequestStartParams,
+)
+
+log = logging.getLogger(__name__)
+
+_attempts: ContextVar[list[float] | None] = ContextVar(
+    "myconso_profile_attempts", default=None
+)
+
+PROFILE_LOOP_INTERVAL = 0.1
+PROFILE_STAGES = (
+    "request",
+    "attempt",
+    "backoff_wait",
+    "connection_queued",
+    "connect",
+    "ttfb",
+    "body_read",
+    "parse",
+    "auth_lock_wait",
+    "auth_lock_hold",
+    "loop_lag",
+)
+
+
+def percentile(samples: list[float], q: float) -> float:
+    s = sorted(samples)
+    return s[min(len(s) - 1, round(q * (len(s) - 1)))]
+
+
+class Profiler:
+    # opt-in timings of what a request spends its time on:
+    # - request: whole session call, including backoff sleeps and retries
+    # - attempt: one try, between the backoff middleware and the network
+    # - backoff_wait: time slept between the attempts of a retried request
+    # - connection_queued/connect/ttfb: aiohttp tracing of the last attempt
+    # - body_read/parse: reading the body, json decoding and clean_json_ld
+    # - auth_lock_wait/auth_lock_hold: MyConsoClient.lock contention
+    # - loop_lag: how late the event loop wakes up a sleeping task
+    def __init__(self, loop_interval: float = PROFILE_LOOP_INTERVAL) -> None:
+        self.loop_interval = loop_interval
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self._monitor: asyncio.Task | None = None
+
+    def record(self, stage: str, value: float) -> None:
+        self.samples[stage].append(value)
+
+    @contextlib.contextmanager
+    def timed(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def lock(self) -> "ProfiledLock":
+        return ProfiledLock(self)
+
+    def start(self) -> None:
+        if self._monitor is None:
+            self._monitor = asyncio.ensure_future(self._monitor_loop())
+
+    async def stop(self) -> None:
+        if self._monitor is not None:
+            self._monitor.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._monitor
+            self._monitor = None
+
+    async def _monitor_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.loop_interval)
+            self.record("loop_lag", max(0.0, loop.time() - start - self.loop_interval))
+
+    async def request_middleware(
+        self, req: ClientRequest, handler: ClientHandlerType
+    ) -> ClientResponse:
+        # goes before exponential_backoff_middleware, what isn't spent in
+        # attempts of a retried request is spent sleeping in the backoff
+        attempts: list[float] = []
+        token = _attempts.set(attempts)
+        start = time.perf_counter()
+        try:
+            return await handler(req)
+        finally:
+            _attempts.reset(token)
+            if len(attempts) > 1:
+                self.record("backoff_wait", time.perf_counter() - start - sum(attempts))
+
+    async def attempt_middleware(
+        self, req: ClientRequest, handler: ClientHandlerType
+    ) -> ClientResponse:
+        # goes after exponential_backoff_middleware
+        start = time.perf_counter()
+        try:
+            return await handler(req)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.record("attempt", elapsed)
+            attempts = _attempts.get()
+            if attempts is not None:
+                attempts.append(elapsed)
+
+    def trace_config(self) -> TraceConfig:
+        def now(ctx: SimpleNamespace, name: str) -> None:
+            setattr(ctx, name, time.perf_counter())
+
+        def since(ctx: SimpleNamespace, name: str, stage: str) -> None:
+            if hasattr(ctx, name):
+                self.record(stage, time.perf_counter() - getattr(ctx, name))
+
+        async def on_request_start(
+            session: ClientSession, ctx: SimpleNamespace, p: TraceRequestStartParams
+        ) -> None:
+            self.start()
+            now(ctx, "request")
+
+        async def on_queued_start(
+            session: ClientSession,
+            ctx: SimpleNamespace,
+            p: TraceConnectionQueuedStartParams,
+        ) -> None:
+            now(ctx, "queued")
+
+        async def on_queued_end(
+            session: ClientSession,
+            ctx: SimpleNamespace,
+            p: TraceConnectionQueuedEndParams,
+        ) -> None:
+            since(ctx, "queued", "connection_queued")
+
+        async def on_create_start(
+            session: ClientSession,
+            ctx: SimpleNamespace,
+            p: TraceConnectionCreateStartParams,
+        ) -> None:
+            now(ctx, "connect")
+
+        async def on_create_end(
+            session: ClientSession,
+            ctx: SimpleNamespace,
+            p: TraceConnectionCreateEndParams,
+        ) -> None:
+            since(ctx, "connect", "connect")
+
+        async def on_headers_sent(
+            session: ClientSession,
+            ctx: SimpleNamespace,
+            p: TraceRequestHeadersSentParams,
+        ) -> None:
+            now(ctx, "headers_sent")
+
+        async def on_request_end(
+            session: ClientSession, ctx: SimpleNamespace, p: TraceRequestEndParams
+        ) -> None:
+            since(ctx, "headers_sent", "ttfb")
+            since(ctx, "request", "request")
+
+        trace_config = TraceConfig()
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_queued_start.append(on_queued_start)
+        trace_config.on_connection_queued_end.append(on_queued_end)
+        trace_config.on_connection_create_start.append(on_create_start)
+        trace_config.on_connection_create_end.append(on_create_end)
+        trace_config.on_request_headers_sent.append(on_headers_sent)
+        trace_config.on_request_end.append(on_request_end)
+        return trace_config
+
+    def report(self) -> dict[str, Any]:
+        report: dict[str, Any] = {}
+        for stage in PROFILE_STAGES:
+            samples = self.samples.get(stage)
+            if not samples:
+                continue
+            report[stage] = {
+                "count": len(samples),
+                "total": round(sum(samples), 6),
+                "mean": round(sum(samples) / len(samples), 6),
+                "p50": round(percentile(samples, 0.5), 6),
+                "p95": round(percentile(samples, 0.95), 6),
+                "max": round(max(samples), 6),
+            }
+        return report
+
+    def format_report(self) -> str:
+        report = self.report()
+        lines = [
+            f"{'stage':<18}{'count':>8}{'total':>12}{'mean':>12}"
+            f"{'p50':>12}{'p95':>12}{'max':>12}"
+        ]
+        for stage in PROFILE_STAGES:
+            if stage in report:
+                s = report[stage]
+                lines.append(
+                    f"{stage:<18}{s['count']:>8}{s['total']:>12.6f}{s['mean']:>12.6f}"
+                    f"{s['p50']:>12.6f}{s['p95']:>12.6f}{s['max']:>12.6f}"
+                )
+        return "\n".join(lines)
+
+
+class ProfiledLock(asyncio.Lock):
+    # drop-in asyncio.Lock recording how long coroutines wait for it
+    # and how long it is held
+    def __init__(self, profiler: Profiler) -> None:
+        super().__init__()
+        self.profiler = profiler
+        self._acquired_at = 0.0
+
+    async def acquire(self) -> Literal[True]:
+        start = time.perf_counter()
+        await super().acquire()
+        self._acquired_at = time.perf_counter()
+        self.profiler.record("auth_lock_wait", self._acquired_at - start)
+        return True
+
+    def release(self) -> None:
+        self.profiler.record("auth_lock_hold", time.perf_counter() - self._acquired_at)
+        super().release()
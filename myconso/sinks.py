@@ -0,0 +1,307 @@
+import asyncio
+import logging
+import math
+from collections.abc import Awaitable, Callable, Iterable
+from datetime import datetime, timezone
+from types import TracebackType
+from typing import Any
+
+from aiohttp import ClientSession
+
+log = logging.getLogger(__name__)
+
+SINK_BATCH_SIZE = 5000
+SINK_FLUSH_INTERVAL = 1.0
+SINK_MAX_PENDING = 20000
+SINK_DASHBOARD_MEASUREMENT = "myconso_dashboard"
+SINK_DASHBOARD_FIELDS = ("value", "minValue", "maxValue", "weightedValue")
+SINK_COPY_COLUMNS = ("time", "measurement", "counter", "value")
+SINK_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# a reading is a dict:
+# {"measurement": str, "tags": {str: str}, "fields": {str: value}, "time": ...}
+# where time is a datetime or an iso 8601 string, naive datetimes are utc
+
+
+def readings_from_values(
+    measurement: str,
+    tags: dict[str, str],
+    values: Iterable[dict],
+    time_key: str = "date",
+) -> list[dict]:
+    # one reading per dict, numeric entries are the fields. The api returns
+    # 0 for 0.0, fields are always floats so influxdb doesn't see an int
+    # and a float for the same field
+    readings = []
+    for v in values:
+        fields = {
+            k: float(x)
+            for k, x in v.items()
+            if isinstance(x, int | float) and not isinstance(x, bool)
+        }
+        if fields and v.get(time_key):
+            readings.append(
+                {
+                    "measurement": measurement,
+                    "tags": tags,
+                    "fields": fields,
+                    "time": v[time_key],
+                }
+            )
+    return readings
+
+
+def readings_from_dashboard(dashboard: dict) -> list[dict]:
+    readings = []
+    for period in ("currentMonth", "lastMonth"):
+        if period not in dashboard:
+            continue
+        for v in dashboard[period]["values"]:
+            fields = {
+                k: float(v[k]) for k in SINK_DASHBOARD_FIELDS if v.get(k) is not None
+            }
+            if not fields:
+                continue
+            for counter in v["counters"]:
+                readings.append(
+                    {
+                        "measurement": SINK_DASHBOARD_MEASUREMENT,
+                        "tags": {
+                            "counter": counter,
+                            "fluidType": v["fluidType"],
+                            "meterType": v["meterType"],
+                            "unit": v["unit"],
+                            "period": period,
+                        },
+                        "fields": fields,
+                        "time": dashboard[period]["endDate"],
+                    }
+                )
+    return readings
+
+
+def _as_datetime(t: datetime | str) -> datetime:
+    dt = datetime.fromisoformat(t) if isinstance(t, str) else t
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _escape_lp(s: str, chars: str) -> str:
+    for c in chars:
+        s = s.replace(c, "\\" + c)
+    return s
+
+
+def _lp_field(v: Any) -> str:
+    if isinstance(v, bool):
+        return "true" if v else "false"
+    if isinstance(v, int):
+        return f"{v}i"
+    if isinstance(v, float):
+        return repr(v)
+    return '"' + _escape_lp(str(v), '\\"') + '"'
+
+
+def encode_line_protocol(reading: dict) -> str:
+    # influxdb line protocol with a nanosecond timestamp, a reading without
+    # any field that can be written is encoded as "" and skipped
+    delta = _as_datetime(reading["time"]) - SINK_EPOCH
+    seconds = delta.days * 86400 + delta.seconds
+    ns = seconds * 1_000_000_000 + delta.microseconds * 1000
+    tags = "".join(
+        f",{_escape_lp(k, ',= ')}={_escape_lp(str(v), ',= ')}"
+        for k, v in sorted(reading["tags"].items())
+        if v is not None and v != ""
+    )
+    fields = ",".join(
+        f"{_escape_lp(k, ',= ')}={_lp_field(v)}"
+        for k, v in reading["fields"].items()
+        # nan and inf can't be written
+        if not (isinstance(v, float) and not math.isfinite(v))
+    )
+    if not fields:
+        return ""
+    return f"{_escape_lp(reading['measurement'], ', ')}{tags} {fields} {ns}"
+
+
+def _copy_value(v: Any) -> str:
+    if v is None:
+        return "\\N"
+    if isinstance(v, datetime):
+        v = _as_datetime(v).isoformat()
+    return (
+        str(v)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def copy_encoder(
+    columns: Iterable[str] = SINK_COPY_COLUMNS,
+) -> Callable[[dict], str]:
+    # postgresql COPY ... FROM STDIN text format, columns are looked up in
+    # time/measurement, then the tags, then the fields of each reading
+    columns = tuple(columns)
+
+    def encode(reading: dict) -> str:
+        row = {
+            "time": _as_datetime(reading["time"]),
+            "measurement": reading["measurement"],
+            **reading["tags"],
+            **reading["fields"],
+        }
+        return "\t".join(_copy_value(row.get(c)) for c in columns)
+
+    return encode
+
+
+class FileTarget:
+    # append every batch to a file, the write runs in the default executor
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def _write(self, payload: bytes) -> None:
+        with open(self.path, "ab") as f:
+            f.write(payload)
+
+    async def __call__(self, payload: bytes) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self._write, payload)
+
+
+class HttpTarget:
+    # POST every batch, e.g. to http://influxdb:8086/api/v2/write?bucket=...
+    def __init__(
+        self,
+        url: str,
+        headers: dict[str, str] | None = None,
+        session: ClientSession | None = None,
+    ) -> None:
+        self.url = url
+        self.headers = headers or {}
+        self._session = session
+        self._owned = session is None
+
+    async def __call__(self, payload: bytes) -> None:
+        if self._session is None:
+            self._session = ClientSession(raise_for_status=True)
+        async with self._session.post(self.url, data=payload, headers=self.headers):
+            pass
+
+    async def close(self) -> None:
+        if self._owned and self._session:
+            await self._session.close()
+
+
+class BatchWriter:
+    # readings are queued and encoded by a background task, a batch is
+    # flushed once it reaches batch_size or is flush_interval seconds old.
+    # put() waits while max_pending readings are queued, so fetchers are
+    # slowed down to the speed of the target
+    def __init__(
+        self,
+        target: Callable[[bytes], Awaitable[None]],
+        encoder: Callable[[dict], str] = encode_line_protocol,
+        batch_size: int = SINK_BATCH_SIZE,
+        flush_interval: float = SINK_FLUSH_INTERVAL,
+        max_pending: int = SINK_MAX_PENDING,
+    ) -> None:
+        self.target = target
+        self.encoder = encoder
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.batches = 0
+        self._queue: asyncio.Queue[dict | None] = asyncio.Queue(max_pending)
+        self._task: asyncio.Task | None = None
+        self._closed = False
+
+    async def __aenter__(self) -> "BatchWriter":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        await self.close()
+
+    async def put(self, reading: dict) -> None:
+        if self._closed:
+            raise RuntimeError("BatchWriter is closed")
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+        elif self._task.done():
+            # the target failed, surface its error to the fetchers
+            self._task.result()
+        try:
+            self._queue.put_nowait(reading)
+            return
+        except asyncio.QueueFull:
+            pass
+
+        # the queue is full, wait for a slot unless the writer task stops
+        put = asyncio.ensure_future(self._queue.put(reading))
+        try:
+            await asyncio.wait({put, self._task}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            if not put.done():
+                put.cancel()
+        if not put.done() or put.cancelled():
+            self._task.result()
+            raise RuntimeError("BatchWriter is closed")
+
+    async def put_many(self, readings: Iterable[dict]) -> None:
+        for r in readings:
+            await self.put(r)
+
+    async def _flush(self, lines: list[str]) -> None:
+        if not lines:
+            return
+        await self.target(("\n".join(lines) + "\n").encode())
+        self.written += len(lines)
+        self.batches += 1
+        log.debug("flushed %s readings, %s written", len(lines), self.written)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        lines: list[str] = []
+        deadline = 0.0
+        while True:
+            timeout = max(0.0, deadline - loop.time()) if lines else None
+            try:
+                reading = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                await self._flush(lines)
+                lines = []
+                continue
+
+            if reading is None:
+                await self._flush(lines)
+                return
+
+            line = self.encoder(reading)
+            if not line:
+                # a line without field would make the target reject the batch
+                log.debug("skip reading without fields: %s", reading)
+                continue
+            if not lines:
+                deadline = loop.time() + self.flush_interval
+            lines.append(line)
+            if len(lines) >= self.batch_size:
+                await self._flush(lines)
+                lines = []
+
+    async def close(self) -> None:
+        # flush what's left and close the target
+        self._closed = True
+        try:
+            if self._task is not None:
+                if not self._task.done():
+                    await self._queue.put(None)
+                await self._task
+        finally:
+            close = getattr(self.target, "close", None)
+            if close:
+                await close()
@@ -14,6 +14,21 @@ def clean_json_ld(obj: dict) -> dict:
     return obj
 
 
+def counters_from_dashboard(dashboard: dict) -> list[dict]:
+    counters = []
+    for v in dashboard["currentMonth"]["values"]:
+        for counter in v["counters"]:
+            counters.append(
+                {
+                    "counter": counter,
+                    "fluidType": v["fluidType"],
+                    "meterType": v["meterType"],
+                    "unit": v["unit"],
+                }
+            )
+    return counters
+
+
 def decode_jwt(token: str) -> tuple[int, int]:
     token_jwt = jwt.decode(
         token,
@@ -24,6 +39,11 @@ def decode_jwt(token: str) -> tuple[int, int]:
     return (token_jwt["exp"], token_jwt["iat"])
 
 
+def as_utc(dt: datetime) -> datetime:
+    # naive datetimes are considered utc
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
 def last_day_of_the_month() -> datetime:
     # last day of the current month
     return datetime.now(timezone.utc).replace(
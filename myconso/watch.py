@@ -0,0 +1,132 @@
+import asyncio
+import hashlib
+import inspect
+import json
+import logging
+from collections.abc import AsyncIterator, Awaitable, Callable
+from typing import Any
+
+from myconso.api import MyConsoClient
+from myconso.utils import counters_from_dashboard
+
+log = logging.getLogger(__name__)
+
+# list items carrying one of these keys are tracked by its value instead of
+# their position, so a reordered list doesn't show up as a change. A list
+# where an item has no such key, or where values repeat, is tracked by
+# position so items never collide
+WATCH_IDENTITY_KEYS = ("counter", "fluidType")
+WATCH_INTERVAL = 300.0
+
+
+def flatten(obj: Any, prefix: str = "") -> dict[str, Any]:
+    # {"a": {"b": [1, 2]}} -> {"a.b.0": 1, "a.b.1": 2}
+    items: list[tuple[Any, Any]]
+    if isinstance(obj, dict):
+        items = list(obj.items())
+    elif isinstance(obj, list):
+        keys = [
+            next((str(v[k]) for k in WATCH_IDENTITY_KEYS if k in v), None)
+            if isinstance(v, dict)
+            else None
+            for v in obj
+        ]
+        if None in keys or len(set(keys)) != len(keys):
+            keys = [str(i) for i in range(len(obj))]
+        items = list(zip(keys, obj, strict=True))
+    else:
+        return {prefix: obj}
+
+    flat = {}
+    for k, v in items:
+        flat.update(flatten(v, f"{prefix}.{k}" if prefix else str(k)))
+    return flat
+
+
+def digest(obj: Any) -> bytes:
+    return hashlib.blake2b(
+        json.dumps(obj, sort_keys=True, separators=(",", ":")).encode(),
+        digest_size=16,
+    ).digest()
+
+
+class ChangeTracker:
+    def __init__(self) -> None:
+        self._digests: dict[str, bytes] = {}
+        self._values: dict[str, dict[str, Any]] = {}
+
+    def update(self, source: str, obj: Any) -> list[dict]:
+        # cheap path, nothing changed since the last update of this source
+        d = digest(obj)
+        if self._digests.get(source) == d:
+            return []
+
+        new = flatten(obj)
+        old = self._values.get(source, {})
+        changes = [
+            {"source": source, "path": path, "old": old.get(path), "new": value}
+            for path, value in new.items()
+            if path not in old or old[path] != value
+        ]
+        changes.extend(
+            {"source": source, "path": path, "old": value, "new": None}
+            for path, value in old.items()
+            if path not in new
+        )
+
+        self._digests[source] = d
+        self._values[source] = new
+        return changes
+
+    def forget(self, source: str) -> None:
+        self._digests.pop(source, None)
+        self._values.pop(source, None)
+
+
+class MyConsoWatcher:
+    def __init__(
+        self,
+        client: MyConsoClient,
+        interval: float = WATCH_INTERVAL,
+        meters: bool = False,
+        callback: Callable[[list[dict]], Awaitable[None] | None] | None = None,
+    ) -> None:
+        self.client = client
+        self.interval = interval
+        self.meters = meters
+        self.callback = callback
+        self.tracker = ChangeTracker()
+
+    async def poll(self) -> list[dict]:
+        dashboard = await self.client.get_dashboard()
+        changes = self.tracker.update("dashboard", dashboard)
+
+        # not client.get_counters(), it's cached after the first call
+        counters = counters_from_dashboard(dashboard)
+        changes.extend(self.tracker.update("counters", counters))
+
+        if self.meters:
+            meters = await asyncio.gather(
+                *(self.client.get_meter(c["counter"]) for c in counters)
+            )
+            for c, meter in zip(counters, meters, strict=True):
+                changes.extend(self.tracker.update(f"meter/{c['counter']}", meter))
+
+        log.debug("poll done, %s changes", len(changes))
+
+        if changes and self.callback:
+            res = self.callback(changes)
+            if inspect.isawaitable(res):
+                await res
+        return changes
+
+    async def __aiter__(self) -> AsyncIterator[list[dict]]:
+        while True:
+            changes = await self.poll()
+            if changes:
+                yield changes
+            await asyncio.sleep(self.interval)
+
+    async def run(self) -> None:
+        async for _ in self:
+            pass
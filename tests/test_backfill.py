@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import AioHTTPTestCase
+
+from myconso.api import MyConsoClient
+from myconso.backfill import BackfillRunner, load_checkpoint, plan_units
+
+logging.basicConfig(level=logging.DEBUG)
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+END = datetime(2025, 4, 1, tzinfo=timezone.utc)
+WINDOW = timedelta(days=31)
+WINDOWS = 3
+# a 500 on a meter window and a lost connection on a consumption window
+FAILURES = 2
+
+
+class TestPlanUnits:
+    def test_plan_units(self):
+        units = plan_units([("meter", "A"), ("consumption", "waterHot")], START, END)
+        assert len(units) == WINDOWS * 2
+        assert units[0] == {
+            "kind": "meter",
+            "id": "A",
+            "start": "2025-01-01T00:00:00+00:00",
+            "end": "2025-01-30T23:59:59+00:00",
+        }
+        assert units[WINDOWS - 1]["end"] == "2025-03-31T23:59:59+00:00"
+
+    def test_naive_dates(self):
+        naive = plan_units([("meter", "A")], START.replace(tzinfo=None), END)
+        assert naive == plan_units([("meter", "A")], START, END)
+
+
+class TestBackfillRunner(AioHTTPTestCase):
+    async def get_application(self):
+        async def auth(request):
+            return web.json_response(
+                {
+                    "company": "test",
+                    "housing": "7552325423",
+                    "refresh_token": "FjgyrAD4aw4f3e59snkvsejhn4yywf7w",
+                    "token": jwt.encode(
+                        {"exp": int(time.time() + 3600), "iat": int(time.time() - 2)},
+                        "secret",
+                        algorithm="HS256",
+                    ),
+                    "user": {"email": "test@test.com"},
+                }
+            )
+
+        async def dashboard(request):
+            return web.json_response(
+                {
+                    "currentMonth": {
+                        "endDate": "2025-12-07T12:01:00+00:00",
+                        "startDate": "2025-12-01T16:53:16+00:00",
+                        "values": [
+                            {
+                                "counters": ["ED379533C5", "ED379533C6"],
+                                "fluidType": "waterHot",
+                                "maxValue": 1.0,
+                                "meterType": "waterHot",
+                                "minValue": 25.0,
+                                "unit": "m3",
+                                "value": 1.0,
+                                "weightedValue": None,
+                            }
+                        ],
+                    },
+                }
+            )
+
+        async def meter(request):
+            self.REQUESTS.append(request.path_qs)
+            # the second window of the second counter fails once
+            if (
+                request.match_info["counter"] == "ED379533C6"
+                and request.query["startDate"].startswith("2025-02-01")
+                and not self.FAILED
+            ):
+                self.FAILED = True
+                return web.Response(status=500)
+            return web.json_response(
+                {"@id": "/meter", "startDate": request.query["startDate"]}
+            )
+
+        async def consumption(request):
+            self.REQUESTS.append(request.path_qs)
+            # the connection is lost on the third window until DISCONNECT is reset
+            if request.query["startDate"].startswith("2025-03-04") and self.DISCONNECT:
+                request.transport.close()
+            return web.json_response(
+                {"@id": "/consumption", "startDate": request.query["startDate"]}
+            )
+
+        self.REQUESTS = []
+        self.FAILED = False
+        self.DISCONNECT = False
+        app = web.Application()
+        app.router.add_post("/auth", auth)
+        app.router.add_get("/secured/consumption/7552325423/dashboard", dashboard)
+        app.router.add_get("/secured/meter/7552325423/waterHot/{counter}", meter)
+        app.router.add_get("/secured/consumption/7552325423/waterHot/day", consumption)
+        return app
+
+    async def test_resume(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            checkpoint = os.path.join(tmp, "backfill.jsonl")
+            progress = []
+
+            async with MyConsoClient(
+                username="aaa", password="aaaa", base_url=str(self.client.make_url(""))
+            ) as c:
+                runner = BackfillRunner(
+                    c,
+                    checkpoint,
+                    START,
+                    END,
+                    window=WINDOW,
+                    concurrency=2,
+                    progress=progress.append,
+                )
+                self.DISCONNECT = True
+                stats = await runner.run()
+                assert stats["total"] == WINDOWS * 3
+                assert stats["done"] == WINDOWS * 3 - FAILURES
+                assert stats["failed"] == FAILURES
+                assert progress[-1]["done"] == stats["done"]
+                assert progress[-1]["eta"] == 0
+
+                self.REQUESTS.clear()
+                self.DISCONNECT = False
+                stats = await runner.run()
+                assert stats["skipped"] == WINDOWS * 3 - FAILURES
+                assert stats["done"] == FAILURES
+                assert len(self.REQUESTS) == FAILURES
+
+            entries = list(load_checkpoint(checkpoint).values())
+            assert len(entries) == WINDOWS * 3
+            assert all(
+                e["data"]["startDate"].startswith(e["start"][:10]) for e in entries
+            )
+
+    async def test_resume_until_now(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            checkpoint = os.path.join(tmp, "backfill.jsonl")
+            # naive start date, as parsed by the cli, and no end date
+            start = datetime.now(timezone.utc).replace(tzinfo=None) - WINDOW
+
+            async with MyConsoClient(
+                username="aaa", password="aaaa", base_url=str(self.client.make_url(""))
+            ) as c:
+                stats = await BackfillRunner(c, checkpoint, start, window=WINDOW).run()
+                assert stats["done"] == stats["total"]
+
+                # the resumed run keeps the end date of the first one
+                self.REQUESTS.clear()
+                stats = await BackfillRunner(c, checkpoint, start, window=WINDOW).run()
+                assert stats["skipped"] == stats["total"]
+                assert self.REQUESTS == []
+
+            assert len(load_checkpoint(checkpoint)) == stats["total"]
+
+    async def test_other_startdate(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            checkpoint = os.path.join(tmp, "backfill.jsonl")
+
+            async with MyConsoClient(
+                username="aaa", password="aaaa", base_url=str(self.client.make_url(""))
+            ) as c:
+                await BackfillRunner(c, checkpoint, START, END, window=WINDOW).run()
+
+                self.REQUESTS.clear()
+                runner = BackfillRunner(c, checkpoint, START + WINDOW, END)
+                with pytest.raises(ValueError, match="starts on"):
+                    await runner.run()
+                assert self.REQUESTS == []
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+import jwt
+from aiohttp import web
+from aiohttp.test_utils import AioHTTPTestCase, TestServer
+
+from myconso.api import MyConsoClient
+from myconso.journal import load_journal, replay_application
+
+logging.basicConfig(level=logging.DEBUG)
+
+ROUND_TRIP = 0.1
+LATENCY_SCALE = 2.0
+
+
+class TestMyConsoClientJournal(AioHTTPTestCase):
+    async def get_application(self):
+        async def auth(request):
+            return web.json_response(
+                {
+                    "company": "test",
+                    "housing": "7552325423",
+                    "refresh_token": "FjgyrAD4aw4f3e59snkvsejhn4yywf7w",
+                    "token": jwt.encode(
+                        {"exp": int(time.time() + 3600), "iat": int(time.time() - 2)},
+                        "secret",
+                        algorithm="HS256",
+                    ),
+                    "user": {"email": "test@test.com"},
+                }
+            )
+
+        async def dashboard(request):
+            self.DASHBOARD += 1
+            if self.DASHBOARD == 1:
+                return web.Response(status=429)
+
+            return web.json_response(
+                {
+                    "currentMonth": {
+                        "endDate": "2025-12-07T12:01:00+00:00",
+                        "startDate": "2025-12-01T16:53:16+00:00",
+                        "values": [
+                            {
+                                "counters": ["ED379533C5"],
+                                "fluidType": "waterHot",
+                                "maxValue": 1.0,
+                                "meterType": "waterHot",
+                                "minValue": 25.0,
+                                "unit": "m3",
+                                "value": float(self.DASHBOARD),
+                                "weightedValue": None,
+                            }
+                        ],
+                    },
+                }
+            )
+
+        async def consumption(request):
+            await asyncio.sleep(ROUND_TRIP)
+            return web.json_response(
+                {
+                    "@context": "/contexts/Consumption",
+                    "startDate": request.query["startDate"],
+                    "endDate": request.query["endDate"],
+                    "values": [],
+                }
+            )
+
+        self.DASHBOARD = 0
+        app = web.Application()
+        app.router.add_post("/auth", auth)
+        app.router.add_get("/secured/consumption/7552325423/dashboard", dashboard)
+        app.router.add_get("/secured/consumption/7552325423/waterHot/day", consumption)
+        return app
+
+    async def test_record_replay(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "journal.jsonl.gz")
+
+            async with MyConsoClient(
+                username="aaa",
+                password="aaaa",
+                base_url=str(self.client.make_url("")),
+                journal=path,
+            ) as c:
+                recorded = [
+                    await c.get_dashboard(),
+                    await c.get_dashboard(),
+                    await c.get_consumption("waterHot"),
+                ]
+
+            entries = list(load_journal(path))
+            assert [e["status"] for e in entries] == [429, 200, 200, 200]
+            assert all("token" not in e["body"] for e in entries)
+
+            server = TestServer(replay_application(path, latency_scale=0))
+            await server.start_server()
+            try:
+                async with MyConsoClient(
+                    username="aaa",
+                    password="aaaa",
+                    base_url=str(server.make_url("")),
+                ) as c:
+                    replayed = [
+                        await c.get_dashboard(),
+                        await c.get_dashboard(),
+                        await c.get_consumption("waterHot"),
+                    ]
+                    # the last recorded response is served once exhausted
+                    assert await c.get_dashboard() == recorded[1]
+            finally:
+                await server.close()
+
+            assert replayed == recorded
+
+    async def test_replay_latency(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "journal.jsonl")
+
+            async with MyConsoClient(
+                username="aaa",
+                password="aaaa",
+                base_url=str(self.client.make_url("")),
+                journal=path,
+            ) as c:
+                await c.get_consumption("waterHot")
+            (entry,) = load_journal(path)
+
+            server = TestServer(replay_application(path, latency_scale=LATENCY_SCALE))
+            await server.start_server()
+            try:
+                async with MyConsoClient(
+                    username="aaa",
+                    password="aaaa",
+                    base_url=str(server.make_url("")),
+                ) as c:
+                    await c.auth()
+                    start = time.perf_counter()
+                    await c.get_consumption("waterHot")
+                    elapsed = time.perf_counter() - start
+            finally:
+                await server.close()
+
+            # the recorded latency, scaled
+            assert elapsed >= entry["elapsed"] * LATENCY_SCALE
+            assert elapsed < entry["elapsed"] * (LATENCY_SCALE + 1)
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+import jwt
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import AioHTTPTestCase
+from yarl import URL
+
+from myconso.api import MyConsoClient
+from myconso.middlewares import (
+    AIMD_DECREASE_FACTOR,
+    PRIORITY_INTERACTIVE,
+    AdaptiveConcurrencyLimiter,
+    route_template,
+)
+
+LIMIT = 16
+CALLS = 4
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+class FakeRequest:
+    def __init__(self, path, method="GET"):
+        self.method = method
+        self.url = URL(path)
+
+
+DASHBOARD = FakeRequest("/secured/consumption/7552325423/dashboard")
+METER = FakeRequest("/secured/meter/7552325423/waterHot/ED379533C5")
+
+
+class FakeResponse:
+    def __init__(self, status):
+        self.status = status
+
+
+class TestAdaptiveConcurrencyLimiter:
+    @pytest.mark.asyncio
+    async def test_additive_increase(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, max_limit=LIMIT)
+
+        async def handler(req):
+            return FakeResponse(200)
+
+        for _ in range(LIMIT * LIMIT):
+            await limiter(DASHBOARD, handler)
+        assert limiter.limit == LIMIT
+        assert limiter.stats()["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_multiplicative_decrease(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=LIMIT)
+        expected = LIMIT * AIMD_DECREASE_FACTOR
+        status = 429
+
+        async def handler(req):
+            await asyncio.sleep(0.01)
+            return FakeResponse(status)
+
+        # a burst of 429 is a single congestion event
+        await asyncio.gather(*(limiter(DASHBOARD, handler) for _ in range(LIMIT)))
+        assert limiter.limit == expected
+
+        await limiter(DASHBOARD, handler)
+        expected *= AIMD_DECREASE_FACTOR
+        assert limiter.limit == expected
+
+        status = 503
+        await limiter(DASHBOARD, handler)
+        expected *= AIMD_DECREASE_FACTOR
+        assert limiter.limit == expected
+
+    @pytest.mark.asyncio
+    async def test_latency_spike(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=LIMIT, max_limit=LIMIT)
+        delay = 0.01
+
+        async def handler(req):
+            await asyncio.sleep(delay)
+            return FakeResponse(200)
+
+        await limiter(DASHBOARD, handler)
+        assert limiter.limit == LIMIT
+
+        delay = 0.3
+        await limiter(DASHBOARD, handler)
+        assert limiter.limit == LIMIT * AIMD_DECREASE_FACTOR
+
+    @pytest.mark.asyncio
+    async def test_latency_per_route(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=LIMIT, max_limit=LIMIT)
+        delays = {DASHBOARD: 0.01, METER: 0.3}
+
+        async def handler(req):
+            await asyncio.sleep(delays[req])
+            return FakeResponse(200)
+
+        for _ in range(CALLS):
+            await limiter(DASHBOARD, handler)
+        # a slow route isn't a spike of a fast one
+        await limiter(METER, handler)
+        assert limiter.limit == LIMIT
+        assert set(limiter.stats()["latency"]) == {
+            "GET /secured/consumption/{}/dashboard",
+            "GET /secured/meter/{}/waterHot/{}",
+        }
+
+    def test_route_template(self):
+        assert route_template(FakeRequest("/secured/users/test@test.com")) == (
+            "GET /secured/users/{}"
+        )
+        assert route_template(FakeRequest("/auth/refresh", "POST")) == (
+            "POST /auth/refresh"
+        )
+
+    @pytest.mark.asyncio
+    async def test_max_in_flight(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=LIMIT, max_limit=LIMIT)
+        in_flight = []
+
+        async def handler(req):
+            in_flight.append(limiter.in_flight)
+            await asyncio.sleep(0.01)
+            return FakeResponse(200)
+
+        await asyncio.gather(*(limiter(DASHBOARD, handler) for _ in range(LIMIT * 4)))
+        assert max(in_flight) == limiter.limit
+        assert limiter.stats() == {
+            "limit": LIMIT,
+            "in_flight": 0,
+            "in_flight_bulk": 0,
+            "waiting": 0,
+            "waiting_bulk": 0,
+            "latency": limiter.latency,
+        }
+
+    @pytest.mark.asyncio
+    async def test_cancel_waiting(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=2)
+        await limiter._acquire(PRIORITY_INTERACTIVE)
+        await limiter._acquire(PRIORITY_INTERACTIVE)
+        waiting = asyncio.ensure_future(limiter._acquire(PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0)
+
+        # a slot is released before the cancelled waiter resumes
+        waiting.cancel()
+        limiter._release(PRIORITY_INTERACTIVE)
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert limiter.stats()["in_flight"] == 1
+        assert limiter.stats()["waiting"] == 0
+
+
+class TestMyConsoClientLimiter(AioHTTPTestCase):
+    async def get_application(self):
+        async def auth(request):
+            if request.path == "/auth/refresh":
+                await asyncio.sleep(0.3)
+            return web.json_response(
+                {
+                    "company": "test",
+                    "housing": "7552325423",
+                    "refresh_token": "FjgyrAD4aw4f3e59snkvsejhn4yywf7w",
+                    "token": jwt.encode(
+                        {"exp": int(time.time() + 3600), "iat": int(time.time() - 2)},
+                        "secret",
+                        algorithm="HS256",
+                    ),
+                    "user": {"email": "test@test.com"},
+                }
+            )
+
+        async def housing(request):
+            self.HOUSING += 1
+            if self.HOUSING == CALLS + 1:
+                return web.Response(status=401)
+            return web.json_response({"@id": "/housing", "housingId": "7552325423"})
+
+        self.HOUSING = 0
+        app = web.Application()
+        app.router.add_post("/auth", auth)
+        app.router.add_post("/auth/refresh", auth)
+        app.router.add_get("/secured/housing/7552325423", housing)
+        return app
+
+    async def test_concurrency(self):
+        async with MyConsoClient(
+            username="aaa", password="aaaa", concurrency=CALLS
+        ) as c:
+            assert c.limiter.limit == CALLS
+
+    async def test_refresh_is_not_a_spike(self):
+        async with MyConsoClient(
+            username="aaa", password="aaaa", base_url=str(self.client.make_url(""))
+        ) as c:
+            for _ in range(CALLS):
+                await c.get_housing()
+            limit = c.limiter.limit
+
+            # 401, slow token refresh, then retry
+            await c.get_housing()
+            assert self.HOUSING == CALLS + 2
+            assert c.limiter.limit >= limit
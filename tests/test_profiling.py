@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+import jwt
+from aiohttp import web
+from aiohttp.test_utils import AioHTTPTestCase
+
+from myconso.api import MyConsoClient
+from myconso.profiling import PROFILE_LOOP_INTERVAL
+
+logging.basicConfig(level=logging.DEBUG)
+
+CALLS = 5
+
+
+class TestMyConsoClientProfile(AioHTTPTestCase):
+    async def get_application(self):
+        async def auth(request):
+            await asyncio.sleep(0.1)
+            return web.json_response(
+                {
+                    "company": "test",
+                    "housing": "7552325423",
+                    "refresh_token": "FjgyrAD4aw4f3e59snkvsejhn4yywf7w",
+                    "token": jwt.encode(
+                        {"exp": int(time.time() + 3600), "iat": int(time.time() - 2)},
+                        "secret",
+                        algorithm="HS256",
+                    ),
+                    "user": {"email": "test@test.com"},
+                }
+            )
+
+        async def housing(request):
+            self.HOUSING += 1
+            if self.HOUSING == 1:
+                return web.Response(status=503)
+            return web.json_response({"@id": "/housing", "housingId": "7552325423"})
+
+        self.HOUSING = 0
+        app = web.Application()
+        app.router.add_post("/auth", auth)
+        app.router.add_get("/secured/housing/7552325423", housing)
+        return app
+
+    async def test_profile(self):
+        async with MyConsoClient(
+            username="aaa",
+            password="aaaa",
+            base_url=str(self.client.make_url("")),
+            profile=True,
+        ) as c:
+            await asyncio.gather(*(c.get_housing() for _ in range(CALLS)))
+            # block the event loop
+            time.sleep(PROFILE_LOOP_INTERVAL * 3)  # noqa: ASYNC251
+            await asyncio.sleep(PROFILE_LOOP_INTERVAL * 2)
+
+        report = c.profiler.report()
+        # every call waited on the auth lock, only the first one authenticated
+        assert report["auth_lock_wait"]["count"] == CALLS
+        assert report["auth_lock_wait"]["max"] >= report["auth_lock_hold"]["max"]
+        assert report["attempt"]["count"] == CALLS + 1
+        assert report["backoff_wait"]["count"] == 1
+        assert report["backoff_wait"]["total"] > 1
+        assert report["request"]["count"] == CALLS + 1
+        assert report["connect"]["count"] >= 1
+        for stage in ("ttfb", "body_read", "parse"):
+            assert report[stage]["count"] >= CALLS
+        assert report["loop_lag"]["max"] >= PROFILE_LOOP_INTERVAL
+        assert "backoff_wait" in c.profiler.format_report()
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+import jwt
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import AioHTTPTestCase
+from yarl import URL
+
+from myconso.api import MyConsoClient
+from myconso.middlewares import (
+    AIMD_INITIAL_LIMIT,
+    AIMD_MIN_LIMIT,
+    PRIORITY_BULK,
+    PRIORITY_INTERACTIVE,
+    AdaptiveConcurrencyLimiter,
+    request_priority,
+)
+
+logging.basicConfig(level=logging.DEBUG)
+
+ROUND_TRIP = 0.2
+COUNTERS = [f"ED3795{i:04}" for i in range(AIMD_INITIAL_LIMIT * 5)]
+
+
+class FakeRequest:
+    def __init__(self, path):
+        self.method = "GET"
+        self.url = URL(path)
+
+
+class FakeResponse:
+    def __init__(self, status):
+        self.status = status
+
+
+class TestPriorityScheduling:
+    @pytest.mark.asyncio
+    async def test_interactive_first(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=2)
+        started = []
+        release = asyncio.Event()
+
+        async def handler(req):
+            started.append(req.url.path[1:])
+            await release.wait()
+            return FakeResponse(200)
+
+        async def call(name, priority):
+            request_priority.set(priority)
+            await limiter(FakeRequest(f"/{name}"), handler)
+
+        tasks = [asyncio.ensure_future(call("bulk-1", PRIORITY_BULK))]
+        await asyncio.sleep(0)
+        # the second slot is reserved to interactive requests
+        tasks.append(asyncio.ensure_future(call("bulk-2", PRIORITY_BULK)))
+        await asyncio.sleep(0)
+        tasks.append(asyncio.ensure_future(call("interactive-1", PRIORITY_INTERACTIVE)))
+        await asyncio.sleep(0)
+        tasks.append(asyncio.ensure_future(call("interactive-2", PRIORITY_INTERACTIVE)))
+        await asyncio.sleep(0)
+        assert started == ["bulk-1", "interactive-1"]
+        assert limiter.stats()["waiting_bulk"] == 1
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert started == ["bulk-1", "interactive-1", "interactive-2", "bulk-2"]
+
+    @pytest.mark.asyncio
+    async def test_reserved_at_min_limit(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=AIMD_INITIAL_LIMIT)
+        release = asyncio.Event()
+
+        async def congested(req):
+            return FakeResponse(429)
+
+        async def handler(req):
+            await release.wait()
+            return FakeResponse(200)
+
+        async def call(priority):
+            request_priority.set(priority)
+            await limiter(FakeRequest("/meter"), handler)
+
+        # a 429 storm brings the limit down to its minimum
+        while limiter.limit > AIMD_MIN_LIMIT:
+            await limiter(FakeRequest("/meter"), congested)
+            await asyncio.sleep(0.001)
+
+        bulk = [asyncio.ensure_future(call(PRIORITY_BULK)) for _ in range(2)]
+        await asyncio.sleep(0)
+        # the reserved slot is still free for an interactive request
+        assert limiter.stats()["in_flight_bulk"] == AIMD_MIN_LIMIT - 1
+        interactive = asyncio.ensure_future(call(PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0)
+        assert limiter.in_flight == AIMD_MIN_LIMIT
+
+        release.set()
+        await asyncio.gather(*bulk, interactive)
+
+    def test_min_limit(self):
+        # bulk requests would never run
+        with pytest.raises(ValueError, match="min_limit"):
+            AdaptiveConcurrencyLimiter(min_limit=1, reserved=1)
+
+    @pytest.mark.asyncio
+    async def test_bulk_context(self):
+        async def priority():
+            return request_priority.get()
+
+        async with MyConsoClient(username="aaa", password="aaaa") as c:
+            assert await priority() == PRIORITY_INTERACTIVE
+            with c.bulk():
+                # tasks created in the context inherit its priority
+                task = asyncio.ensure_future(priority())
+            assert await task == PRIORITY_BULK
+            assert await priority() == PRIORITY_INTERACTIVE
+
+
+class TestMyConsoClientScheduler(AioHTTPTestCase):
+    async def get_application(self):
+        async def auth(request):
+            return web.json_response(
+                {
+                    "company": "test",
+                    "housing": "7552325423",
+                    "refresh_token": "FjgyrAD4aw4f3e59snkvsejhn4yywf7w",
+                    "token": jwt.encode(
+                        {"exp": int(time.time() + 3600), "iat": int(time.time() - 2)},
+                        "secret",
+                        algorithm="HS256",
+                    ),
+                    "user": {"email": "test@test.com"},
+                }
+            )
+
+        async def dashboard(request):
+            return web.json_response(
+                {
+                    "currentMonth": {
+                        "endDate": "2025-12-07T12:01:00+00:00",
+                        "startDate": "2025-12-01T16:53:16+00:00",
+                        "values": [
+                            {
+                                "counters": COUNTERS,
+                                "fluidType": "waterHot",
+                                "maxValue": 1.0,
+                                "meterType": "waterHot",
+                                "minValue": 25.0,
+                                "unit": "m3",
+                                "value": 1.0,
+                                "weightedValue": None,
+                            }
+                        ],
+                    },
+                }
+            )
+
+        async def meter(request):
+            await asyncio.sleep(ROUND_TRIP)
+            return web.json_response({"@id": "/meter"})
+
+        app = web.Application()
+        app.router.add_post("/auth", auth)
+        app.router.add_get("/secured/consumption/7552325423/dashboard", dashboard)
+        app.router.add_get("/secured/meter/7552325423/waterHot/{counter}", meter)
+        return app
+
+    async def test_interactive_during_bulk(self):
+        async with MyConsoClient(
+            username="aaa", password="aaaa", base_url=str(self.client.make_url(""))
+        ) as c:
+            await c.get_counters()
+
+            with c.bulk():
+                pull = asyncio.gather(*(c.get_meter(counter) for counter in COUNTERS))
+            await asyncio.sleep(ROUND_TRIP / 2)
+            # bulk requests leave a slot to interactive ones
+            assert c.limiter.stats()["in_flight_bulk"] == AIMD_INITIAL_LIMIT - 1
+
+            start = time.perf_counter()
+            await c.get_dashboard()
+            assert time.perf_counter() - start < ROUND_TRIP
+
+            assert len(await pull) == len(COUNTERS)
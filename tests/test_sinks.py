@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import tempfile
+from datetime import datetime, timezone
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import AioHTTPTestCase
+
+from myconso.sinks import (
+    BatchWriter,
+    FileTarget,
+    HttpTarget,
+    copy_encoder,
+    encode_line_protocol,
+    readings_from_dashboard,
+    readings_from_values,
+)
+
+logging.basicConfig(level=logging.DEBUG)
+
+DASHBOARD = {
+    "currentMonth": {
+        "endDate": "2025-12-07T12:01:00+00:00",
+        "startDate": "2025-12-01T16:53:16+00:00",
+        "values": [
+            {
+                "counters": ["ED379533C5"],
+                "fluidType": "waterHot",
+                "maxValue": 1.0,
+                "meterType": "waterHot",
+                "minValue": 25.0,
+                "unit": "m3",
+                "value": 1.5,
+                "weightedValue": None,
+            }
+        ],
+    },
+}
+BATCH_SIZE = 10
+READINGS = 25
+PENDING = 2
+
+
+class TestEncoders:
+    def test_line_protocol(self):
+        readings = readings_from_dashboard(DASHBOARD)
+        assert [encode_line_protocol(r) for r in readings] == [
+            "myconso_dashboard,counter=ED379533C5,fluidType=waterHot,"
+            "meterType=waterHot,period=currentMonth,unit=m3 "
+            "value=1.5,minValue=25.0,maxValue=1.0 1765108860000000000"
+        ]
+
+        reading = {
+            "measurement": "my meter",
+            "tags": {"counter": "a,b=c", "empty": ""},
+            "fields": {"index": 3, "ok": True, "note": 'say "hi"', "nan": float("nan")},
+            "time": datetime(2025, 1, 1, 0, 0, 0, 1),
+        }
+        assert encode_line_protocol(reading) == (
+            "my\\ meter,counter=a\\,b\\=c "
+            'index=3i,ok=true,note="say \\"hi\\"" 1735689600000001000'
+        )
+
+    def test_no_fields(self):
+        reading = {
+            "measurement": "meter",
+            "tags": {},
+            "fields": {"value": float("inf")},
+            "time": datetime(2025, 1, 1),
+        }
+        assert encode_line_protocol(reading) == ""
+        assert encode_line_protocol({**reading, "fields": {}}) == ""
+
+    def test_numeric_fields(self):
+        # 0 and 1.5 are the same field, written with the same type
+        readings = readings_from_values(
+            "meter",
+            {"counter": "ED379533C5"},
+            [
+                {"date": "2025-12-01T00:00:00+00:00", "value": 0},
+                {"date": "2025-12-02T00:00:00+00:00", "value": 1.5},
+            ],
+        )
+        assert [encode_line_protocol(r) for r in readings] == [
+            "meter,counter=ED379533C5 value=0.0 1764547200000000000",
+            "meter,counter=ED379533C5 value=1.5 1764633600000000000",
+        ]
+
+    def test_copy(self):
+        readings = readings_from_values(
+            "meter",
+            {"counter": "ED379533C5"},
+            [
+                {"date": "2025-12-01T00:00:00+00:00", "value": 1.5, "label": "a"},
+                {"date": "2025-12-02T00:00:00+00:00", "value": 2},
+                {"date": None, "value": 3},
+            ],
+        )
+        encode = copy_encoder(("time", "counter", "value", "missing"))
+        assert [encode(r) for r in readings] == [
+            "2025-12-01T00:00:00+00:00\tED379533C5\t1.5\t\\N",
+            "2025-12-02T00:00:00+00:00\tED379533C5\t2.0\t\\N",
+        ]
+
+
+class TestBatchWriter:
+    @pytest.mark.asyncio
+    async def test_file_target(self):
+        readings = [
+            {
+                "measurement": "meter",
+                "tags": {"counter": "ED379533C5"},
+                "fields": {"value": float(i)},
+                "time": datetime(2025, 12, 1, 0, i, tzinfo=timezone.utc),
+            }
+            for i in range(READINGS)
+        ]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "meter.lp")
+            async with BatchWriter(FileTarget(path), batch_size=BATCH_SIZE) as w:
+                await w.put_many(readings)
+
+            assert w.written == READINGS
+            assert w.batches == READINGS // BATCH_SIZE + 1
+            with open(path) as f:  # noqa: ASYNC230
+                assert f.read().splitlines() == [
+                    encode_line_protocol(r) for r in readings
+                ]
+
+    @pytest.mark.asyncio
+    async def test_flush_interval(self):
+        payloads = []
+
+        async def target(payload):
+            payloads.append(payload)
+
+        async with BatchWriter(target, flush_interval=0.05) as w:
+            await w.put_many(readings_from_dashboard(DASHBOARD))
+            await asyncio.sleep(0.2)
+            assert len(payloads) == 1
+        assert w.written == 1
+
+    @pytest.mark.asyncio
+    async def test_skip_no_fields(self):
+        payloads = []
+
+        async def target(payload):
+            payloads.append(payload)
+
+        reading = readings_from_dashboard(DASHBOARD)[0]
+        async with BatchWriter(target) as w:
+            await w.put({**reading, "fields": {"value": float("nan")}})
+            await w.put(reading)
+        assert payloads == [f"{encode_line_protocol(reading)}\n".encode()]
+        assert w.written == 1
+
+    @pytest.mark.asyncio
+    async def test_put_after_close(self):
+        async def target(payload):
+            pass
+
+        reading = readings_from_dashboard(DASHBOARD)[0]
+        async with BatchWriter(target) as w:
+            await w.put(reading)
+        # the reading would never be written
+        with pytest.raises(RuntimeError, match="closed"):
+            await w.put(reading)
+
+    @pytest.mark.asyncio
+    async def test_backpressure(self):
+        flushing = asyncio.Event()
+        release = asyncio.Event()
+
+        async def target(payload):
+            flushing.set()
+            await release.wait()
+
+        reading = readings_from_dashboard(DASHBOARD)[0]
+        w = BatchWriter(target, batch_size=1, max_pending=PENDING)
+        # one reading is being flushed, the queue is full
+        for _ in range(PENDING + 1):
+            await w.put(reading)
+        await flushing.wait()
+
+        blocked = asyncio.ensure_future(w.put(reading))
+        await asyncio.sleep(0.05)
+        assert not blocked.done()
+
+        release.set()
+        await blocked
+        await w.close()
+        assert w.written == PENDING + 2
+
+    @pytest.mark.asyncio
+    async def test_target_failure(self):
+        flushing = asyncio.Event()
+        release = asyncio.Event()
+
+        class Target:
+            closed = False
+
+            async def __call__(self, payload):
+                flushing.set()
+                await release.wait()
+                raise ValueError("write failed")
+
+            async def close(self):
+                self.closed = True
+
+        target = Target()
+        reading = readings_from_dashboard(DASHBOARD)[0]
+        w = BatchWriter(target, batch_size=1, max_pending=PENDING)
+        for _ in range(PENDING + 1):
+            await w.put(reading)
+        await flushing.wait()
+
+        # a producer waiting on the full queue gets the error of the target
+        blocked = asyncio.ensure_future(w.put(reading))
+        await asyncio.sleep(0.05)
+        release.set()
+        with pytest.raises(ValueError, match="write failed"):
+            await asyncio.wait_for(blocked, 1)
+
+        with pytest.raises(ValueError, match="write failed"):
+            await w.close()
+        assert target.closed
+
+
+class TestHttpTarget(AioHTTPTestCase):
+    async def get_application(self):
+        async def write(request):
+            assert request.query["bucket"] == "myconso"
+            assert request.headers["authorization"] == "Token aaa"
+            self.BODIES.append(await request.text())
+            return web.Response(status=204)
+
+        self.BODIES = []
+        app = web.Application()
+        app.router.add_post("/api/v2/write", write)
+        return app
+
+    async def test_http_target(self):
+        target = HttpTarget(
+            str(self.client.make_url("/api/v2/write?bucket=myconso")),
+            headers={"authorization": "Token aaa"},
+        )
+        readings = readings_from_dashboard(DASHBOARD) * READINGS
+        async with BatchWriter(target, batch_size=BATCH_SIZE) as w:
+            await w.put_many(readings)
+
+        lines = "".join(self.BODIES).splitlines()
+        assert len(self.BODIES) == READINGS // BATCH_SIZE + 1
+        assert lines == [encode_line_protocol(r) for r in readings]
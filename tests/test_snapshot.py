@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+import jwt
+from aiohttp import web
+from aiohttp.test_utils import AioHTTPTestCase
+
+from myconso.api import MyConsoClient
+from myconso.middlewares import AIMD_INITIAL_LIMIT
+
+logging.basicConfig(level=logging.DEBUG)
+
+ROUND_TRIP = 0.2
+# more counters than requests allowed in flight
+COUNTERS = [f"ED3795{i:04}" for i in range(AIMD_INITIAL_LIMIT + 1)]
+
+
+class TestMyConsoClientSnapshot(AioHTTPTestCase):
+    async def get_application(self):
+        async def auth(request):
+            self.AUTH += 1
+            await asyncio.sleep(ROUND_TRIP)
+            return web.json_response(
+                {
+                    "company": "test",
+                    "housing": "7552325423",
+                    "refresh_token": "FjgyrAD4aw4f3e59snkvsejhn4yywf7w",
+                    "token": jwt.encode(
+                        {"exp": int(time.time() + 3600), "iat": int(time.time() - 2)},
+                        "secret",
+                        algorithm="HS256",
+                    ),
+                    "user": {"email": "test@test.com"},
+                }
+            )
+
+        async def user(request):
+            await asyncio.sleep(ROUND_TRIP)
+            return web.json_response({"@id": "/users", "email": "test@test.com"})
+
+        async def housing(request):
+            await asyncio.sleep(ROUND_TRIP)
+            return web.json_response({"@id": "/housing", "housingId": "7552325423"})
+
+        async def dashboard(request):
+            await asyncio.sleep(ROUND_TRIP)
+            return web.json_response(
+                {
+                    "currentMonth": {
+                        "endDate": "2025-12-07T12:01:00+00:00",
+                        "startDate": "2025-12-01T16:53:16+00:00",
+                        "values": [
+                            {
+                                "counters": COUNTERS,
+                                "fluidType": "waterHot",
+                                "maxValue": 1.0,
+                                "meterType": "waterHot",
+                                "minValue": 25.0,
+                                "unit": "m3",
+                                "value": 1.0,
+                                "weightedValue": None,
+                            }
+                        ],
+                    },
+                }
+            )
+
+        async def meter_info(request):
+            await asyncio.sleep(ROUND_TRIP)
+            return web.json_response(
+                {"@id": "/meter", "counter": request.match_info["counter"]}
+            )
+
+        self.AUTH = 0
+        app = web.Application()
+        app.router.add_post("/auth", auth)
+        app.router.add_get("/secured/users/test@test.com", user)
+        app.router.add_get("/secured/housing/7552325423", housing)
+        app.router.add_get("/secured/consumption/7552325423/dashboard", dashboard)
+        app.router.add_get(
+            "/secured/meter/7552325423/waterHot/{counter}/info", meter_info
+        )
+        return app
+
+    async def test_snapshot(self):
+        async with MyConsoClient(
+            username="aaa", password="aaaa", base_url=str(self.client.make_url(""))
+        ) as c:
+            res = await c.snapshot()
+
+        assert res["user"] == {"email": "test@test.com"}
+        assert res["housing"] == {"housingId": "7552325423"}
+        assert [c["counter"] for c in res["counters"]] == COUNTERS
+        assert res["meters"] == {counter: {"counter": counter} for counter in COUNTERS}
+        assert set(res["timings"]) == {
+            "auth",
+            "user",
+            "housing",
+            "dashboard",
+            "meter_info",
+            "total",
+        }
+        # auth, then dashboard and meters info, user and housing run alongside
+        assert res["timings"]["total"] < ROUND_TRIP * 4
+
+    async def test_concurrent_auth(self):
+        async with MyConsoClient(
+            username="aaa", password="aaaa", base_url=str(self.client.make_url(""))
+        ) as c:
+            await asyncio.gather(c.get_user(), c.get_housing(), c.get_dashboard())
+        assert self.AUTH == 1
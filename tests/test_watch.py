@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import logging
+import time
+
+import jwt
+from aiohttp import web
+from aiohttp.test_utils import AioHTTPTestCase
+
+from myconso.api import MyConsoClient
+from myconso.watch import ChangeTracker, MyConsoWatcher
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+class TestChangeTracker:
+    def test_update(self):
+        tracker = ChangeTracker()
+        first = tracker.update("meter", {"values": [{"counter": "A", "value": 1}]})
+        assert first == [
+            {"source": "meter", "path": "values.A.counter", "old": None, "new": "A"},
+            {"source": "meter", "path": "values.A.value", "old": None, "new": 1},
+        ]
+
+        assert tracker.update("meter", {"values": [{"counter": "A", "value": 1}]}) == []
+
+        changes = tracker.update(
+            "meter",
+            {"values": [{"counter": "B", "value": 3}, {"counter": "A", "value": 2}]},
+        )
+        assert sorted(changes, key=lambda c: c["path"]) == [
+            {"source": "meter", "path": "values.A.value", "old": 1, "new": 2},
+            {"source": "meter", "path": "values.B.counter", "old": None, "new": "B"},
+            {"source": "meter", "path": "values.B.value", "old": None, "new": 3},
+        ]
+
+        changes = tracker.update("meter", {"values": []})
+        assert {c["path"] for c in changes} == {
+            "values.A.counter",
+            "values.A.value",
+            "values.B.counter",
+            "values.B.value",
+        }
+        assert all(c["new"] is None for c in changes)
+
+    def test_repeated_identity(self):
+        tracker = ChangeTracker()
+        values = [
+            {"fluidType": "water", "meterType": "waterHot", "value": 1},
+            {"fluidType": "water", "meterType": "waterCold", "value": 2},
+        ]
+        first = tracker.update("dashboard", {"values": values})
+        assert {c["path"]: c["new"] for c in first} == {
+            "values.0.fluidType": "water",
+            "values.0.meterType": "waterHot",
+            "values.0.value": 1,
+            "values.1.fluidType": "water",
+            "values.1.meterType": "waterCold",
+            "values.1.value": 2,
+        }
+
+        values[1]["value"] = 3
+        assert tracker.update("dashboard", {"values": values}) == [
+            {"source": "dashboard", "path": "values.1.value", "old": 2, "new": 3}
+        ]
+
+        # an identity looking like a position doesn't collide with one
+        tracker = ChangeTracker()
+        changes = tracker.update("meter", [{"counter": "1"}, {"value": 2}])
+        assert {c["path"] for c in changes} == {"0.counter", "1.value"}
+
+
+class TestMyConsoWatcher(AioHTTPTestCase):
+    async def get_application(self):
+        async def auth(request):
+            return web.json_response(
+                {
+                    "company": "test",
+                    "housing": "7552325423",
+                    "refresh_token": "FjgyrAD4aw4f3e59snkvsejhn4yywf7w",
+                    "token": jwt.encode(
+                        {"exp": int(time.time() + 3600), "iat": int(time.time() - 2)},
+                        "secret",
+                        algorithm="HS256",
+                    ),
+                    "user": {"email": "test@test.com"},
+                }
+            )
+
+        async def dashboard(request):
+            return web.json_response(
+                {
+                    "currentMonth": {
+                        "endDate": "2025-12-07T12:01:00+00:00",
+                        "startDate": "2025-12-01T16:53:16+00:00",
+                        "values": [
+                            {
+                                "counters": self.COUNTERS,
+                                "fluidType": "waterHot",
+                                "maxValue": 1.0,
+                                "meterType": "waterHot",
+                                "minValue": 25.0,
+                                "unit": "m3",
+                                "value": self.VALUE,
+                                "weightedValue": None,
+                            }
+                        ],
+                    },
+                }
+            )
+
+        async def meter(request):
+            return web.json_response({"@id": "/meter", "index": self.VALUE * 10})
+
+        self.VALUE = 1.0
+        self.COUNTERS = ["ED379533C5"]
+        app = web.Application()
+        app.router.add_post("/auth", auth)
+        app.router.add_get("/secured/consumption/7552325423/dashboard", dashboard)
+        app.router.add_get("/secured/meter/7552325423/waterHot/{counter}", meter)
+        return app
+
+    async def test_watch(self):
+        received = []
+
+        async with MyConsoClient(
+            username="aaa", password="aaaa", base_url=str(self.client.make_url(""))
+        ) as c:
+            watcher = MyConsoWatcher(
+                c, interval=0, meters=True, callback=received.append
+            )
+
+            first = await watcher.poll()
+            assert {c["source"] for c in first} == {
+                "dashboard",
+                "counters",
+                "meter/ED379533C5",
+            }
+
+            assert await watcher.poll() == []
+
+            self.VALUE = 2.0
+            changes = await watcher.poll()
+            assert changes == [
+                {
+                    "source": "dashboard",
+                    "path": "currentMonth.values.waterHot.value",
+                    "old": 1.0,
+                    "new": 2.0,
+                },
+                {
+                    "source": "meter/ED379533C5",
+                    "path": "index",
+                    "old": 10.0,
+                    "new": 20.0,
+                },
+            ]
+
+            # the callback is only called when something changed
+            assert received == [first, changes]
+
+            self.VALUE = 3.0
+            async for changes in watcher:
+                assert {c["new"] for c in changes} == {3.0, 30.0}
+                break
+
+    async def test_new_counter(self):
+        async with MyConsoClient(
+            username="aaa", password="aaaa", base_url=str(self.client.make_url(""))
+        ) as c:
+            watcher = MyConsoWatcher(c, interval=0, meters=True)
+            await watcher.poll()
+
+            self.COUNTERS = ["ED379533C5", "ED379533C6"]
+            changes = await watcher.poll()
+            assert {c["source"] for c in changes} == {
+                "dashboard",
+                "counters",
+                "meter/ED379533C6",
+            }